@@ -1,16 +1,33 @@
 from pathlib import Path
-import json
-import joblib
+import gc
+import hashlib
+import html
+import logging
+import math
+import os
+import queue
+import threading
+from concurrent.futures import Future
+
+# Predictions run on a few rows at a time; an OpenMP thread team per call
+# costs more than it saves. Must be set before numpy/sklearn are imported.
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import io, base64
-from flask import Flask, request, render_template_string
+import orjson
+from functools import lru_cache
+from flask import Flask, request, make_response
+from flask_compress import Compress
+
+log = logging.getLogger(__name__)
 
 # -----------------------
 # Paths & startup checks
 # -----------------------
 BASE_DIR = Path(__file__).resolve().parent
 MODEL_PATH = BASE_DIR / "ml" / "model.pkl"
+ONNX_PATH = BASE_DIR / "ml" / "model.onnx"  # optional, written by ml/export_onnx.py
 META_PATH = BASE_DIR / "ml" / "metadata.json"
 DATA_CANDIDATES = [
     BASE_DIR / "data" / "vehicles_100_corrected.csv",
@@ -20,12 +37,26 @@ DATA_CANDIDATES = [
 if not MODEL_PATH.exists():
     raise FileNotFoundError(f"Model not found at {MODEL_PATH}. Train model first.")
 
-model = joblib.load(MODEL_PATH)
+
+@lru_cache(maxsize=None)
+def get_model():
+    """Load the trained pipeline on first use.
+
+    joblib (and sklearn with it) is only imported here, so workers bind
+    without paying for the unpickle up front.
+    """
+    import joblib
+    model = joblib.load(MODEL_PATH)
+    # Trained with n_jobs=-1; at predict time the per-call thread pool
+    # outweighs the work for the few rows in a batch
+    est = model.steps[-1][1] if hasattr(model, "steps") else model
+    if "n_jobs" in est.get_params():
+        est.set_params(n_jobs=1)
+    return model
 
 # Load metadata
 if META_PATH.exists():
-    with open(META_PATH, "r", encoding="utf8") as f:
-        meta = json.load(f)
+    meta = orjson.loads(META_PATH.read_bytes())
 else:
     meta = {
         "categorical": ["Make", "Model", "Fuel", "Transmission"],
@@ -36,27 +67,334 @@ else:
 CATEGORICAL = meta["categorical"]
 NUMERIC = meta["numeric"]
 TARGET = meta["target"]
+# Model input order, built once instead of concatenating the lists per request
+FIELDS = tuple(CATEGORICAL) + tuple(NUMERIC)
 
-# Load dataset for dropdowns & fleet avg
-fleet_df = None
-for p in DATA_CANDIDATES:
-    if p.exists():
-        try:
-            fleet_df = pd.read_csv(p)
-            break
-        except Exception:
-            pass
-
-fleet_avg = float(fleet_df[TARGET].mean()) if fleet_df is not None else None
-dropdown_values = {
-    col: sorted(fleet_df[col].dropna().unique()) if col in fleet_df.columns else []
-    for col in CATEGORICAL
+# Load dataset for dropdowns & fleet avg (only the columns used below)
+FLEET_COLUMNS = set(CATEGORICAL) | {TARGET}
+FLEET_DTYPES = {c: "category" for c in CATEGORICAL} | {TARGET: "float32"}
+
+def _load_fleet_stats():
+    """Read the fleet CSV and return (fleet_avg, dropdown_values).
+
+    The DataFrame never leaves this function, so it is freed as soon as the
+    two summaries have been pulled out of it.
+    """
+    fleet_df = None
+    for p in DATA_CANDIDATES:
+        if p.exists():
+            try:
+                fleet_df = pd.read_csv(p, usecols=lambda c: c in FLEET_COLUMNS, dtype=FLEET_DTYPES)
+                break
+            except Exception:
+                pass
+
+    if fleet_df is None:
+        return None, {col: () for col in CATEGORICAL}
+
+    # Rounded like predictions so the float32 column doesn't leak noise into the page
+    fleet_avg = round(float(fleet_df[TARGET].mean()), 2)
+    dropdown_values = {
+        # The category dtype already holds the distinct non-null values; no pass over the rows
+        col: tuple(sorted(fleet_df[col].cat.categories.tolist())) if col in fleet_df.columns else ()
+        for col in CATEGORICAL
+    }
+    return fleet_avg, dropdown_values
+
+
+fleet_avg, dropdown_values = _load_fleet_stats()
+# pandas objects can hold reference cycles; reclaim them now rather than at some later collection
+gc.collect()
+
+# The dropdowns never change after startup, so their <option> lists are
+# rendered once here instead of looping in Jinja on every request
+SELECT_HTML = {
+    col: "".join(
+        f'<option value="{html.escape(str(v))}">{html.escape(str(v))}</option>' for v in values
+    )
+    for col, values in dropdown_values.items()
 }
 
+# -----------------------
+# Prediction & graph
+# -----------------------
+# Everything in the comparison graph except the two bar heights is fixed
+# once fleet_avg is known, so it is baked into a format string at startup.
+_SVG_PLOT_H = 260  # pixel height of the tallest bar
+_SVG_BASE = 320  # y coordinate of the x axis
+_SVG_TMPL = (
+    '<svg xmlns="http://www.w3.org/2000/svg" width="500" height="400" '
+    'viewBox="0 0 500 400" role="img" aria-label="CO₂ Emission Comparison" '
+    'font-family="Roboto, sans-serif">'
+    '<text x="250" y="30" text-anchor="middle" font-size="18">CO₂ Emission Comparison</text>'
+    '<text x="20" y="190" text-anchor="middle" font-size="14" transform="rotate(-90 20 190)">CO₂ g/km</text>'
+    f'<line x1="50" y1="{_SVG_BASE}" x2="470" y2="{_SVG_BASE}" stroke="#222"/>'
+    '<rect x="90" y="{y_pred:.1f}" width="140" height="{h_pred:.1f}" fill="#0d3b66"/>'
+    '<rect x="290" y="{y_avg:.1f}" width="140" height="{h_avg:.1f}" fill="#66bb6a"/>'
+    '<text x="160" y="{y_pred_label:.1f}" text-anchor="middle" font-size="14">{pred:.2f}</text>'
+    '<text x="360" y="{y_avg_label:.1f}" text-anchor="middle" font-size="14">'
+    f'{fleet_avg if fleet_avg is not None else 0.0:.2f}</text>'
+    f'<text x="160" y="{_SVG_BASE + 24}" text-anchor="middle" font-size="14">Your Car</text>'
+    f'<text x="360" y="{_SVG_BASE + 24}" text-anchor="middle" font-size="14">Fleet Avg</text>'
+    '</svg>'
+)
+
+
+def _svg_bars(pred):
+    """Render the "Your Car" vs "Fleet Avg" comparison as an inline SVG string."""
+    scale = _SVG_PLOT_H / (max(pred, fleet_avg) or 1.0)
+    h_pred = pred * scale
+    h_avg = fleet_avg * scale
+    return _SVG_TMPL.format(
+        pred=pred,
+        h_pred=h_pred,
+        h_avg=h_avg,
+        y_pred=_SVG_BASE - h_pred,
+        y_avg=_SVG_BASE - h_avg,
+        y_pred_label=_SVG_BASE - h_pred - 8,
+        y_avg_label=_SVG_BASE - h_avg - 8,
+    )
+
+
+# Without the fleet CSV there is no average to compare against: no graph,
+# and every car gets the "better than average" suggestions. Resolved once
+# here rather than None-checked on each request.
+if fleet_avg is not None:
+    _render_graph = _svg_bars
+    _IS_HIGH = lambda p: p > fleet_avg  # noqa: E731
+else:
+    _render_graph = lambda p: None  # noqa: E731
+    _IS_HIGH = lambda p: False  # noqa: E731
+
+
+# One-row model input, preallocated once and refilled in place per prediction.
+# Each thread gets its own copy so concurrent requests never share a frame.
+_X_TEMPLATE = pd.DataFrame(
+    {c: pd.Series([None], dtype=object) for c in CATEGORICAL}
+    | {n: pd.Series([0.0]) for n in NUMERIC},
+    columns=FIELDS,
+)
+_X_LOCAL = threading.local()
+
+
+def _input_frame(cat_tuple, num_tuple):
+    """Return this thread's input frame filled with the given values."""
+    X = getattr(_X_LOCAL, "frame", None)
+    if X is None:
+        X = _X_LOCAL.frame = _X_TEMPLATE.copy()
+    for c, v in zip(CATEGORICAL, cat_tuple):
+        X.at[0, c] = v
+    for n, v in zip(NUMERIC, num_tuple):
+        X.at[0, n] = v
+    return X
+
+
+def _pipeline_predict(model, rows):
+    """Predict rows of (cat_tuple, num_tuple) through the full sklearn pipeline."""
+    if len(rows) == 1:
+        X = _input_frame(*rows[0])
+    else:
+        X = pd.DataFrame([c + n for c, n in rows], columns=FIELDS)
+    return model.predict(X)
+
+
+def _compile_encoder(model):
+    """Build a row encoder that replaces the pipeline's ColumnTransformer, if possible.
+
+    For the pipeline layout train_model.py produces (imputers and a one-hot
+    encoder feeding a single estimator) the fitted statistics are read once,
+    and each row is encoded straight into a numpy array in the trained
+    column order. Returns None for any layout it doesn't recognise, in which
+    case the full pipeline is used.
+    """
+    from sklearn.compose import ColumnTransformer
+    from sklearn.impute import SimpleImputer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder
+
+    if not isinstance(model, Pipeline) or len(model.steps) != 2:
+        return None
+    prep, est = model.steps[0][1], model.steps[1][1]
+    if not isinstance(prep, ColumnTransformer):
+        return None
+
+    fields = FIELDS
+    # (input position, fill value for missing, first output column, {category: output column} or None)
+    slots = []
+    width = 0
+    for name, trans, cols in prep.transformers_:
+        if isinstance(trans, str):
+            if trans == "drop":
+                continue
+            return None
+        if not all(isinstance(c, str) and c in fields for c in cols):
+            return None
+
+        imputer = encoder = None
+        for _, step in (trans.steps if isinstance(trans, Pipeline) else [(name, trans)]):
+            if isinstance(step, SimpleImputer) and imputer is None and encoder is None and not step.add_indicator:
+                imputer = step
+            elif (isinstance(step, OneHotEncoder) and encoder is None and step.drop is None
+                  and step.handle_unknown == "ignore" and not getattr(step, "_infrequent_enabled", False)):
+                encoder = step
+            else:
+                return None
+
+        for j, col in enumerate(cols):
+            fill = imputer.statistics_[j] if imputer is not None else None
+            if encoder is None:
+                slots.append((fields.index(col), fill, width, None))
+                width += 1
+            else:
+                cats = encoder.categories_[j]
+                slots.append((fields.index(col), fill, width, {v: width + k for k, v in enumerate(cats)}))
+                width += len(cats)
+
+    if getattr(est, "n_features_in_", None) != width:
+        return None
+
+    def encode(rows):
+        # Tree estimators work in float32 internally; build it that way to skip a cast
+        X = np.zeros((len(rows), width), dtype=np.float32)
+        for i, (cat_tuple, num_tuple) in enumerate(rows):
+            values = cat_tuple + num_tuple
+            for pos, fill, col, index in slots:
+                v = values[pos]
+                if v is None or v != v:
+                    v = fill
+                if index is None:
+                    X[i, col] = v
+                else:
+                    # Unknown categories are all-zero, as with handle_unknown="ignore"
+                    hit = index.get(v)
+                    if hit is not None:
+                        X[i, hit] = 1.0
+        return X
+
+    return encode
+
+
+def _onnx_session():
+    """Open ml/model.onnx if onnxruntime is installed and the file loads and matches model.pkl."""
+    if not ONNX_PATH.exists():
+        return None
+    try:
+        import onnxruntime as ort
+    except ImportError:
+        return None
+
+    opts = ort.SessionOptions()
+    opts.intra_op_num_threads = 1
+    opts.inter_op_num_threads = 1
+    try:
+        sess = ort.InferenceSession(str(ONNX_PATH), opts, providers=["CPUExecutionProvider"])
+        source = sess.get_modelmeta().custom_metadata_map.get("source_sha256")
+    except Exception:
+        # Corrupt file, unsupported opset/IR version, ...: sklearn still works
+        log.warning("Ignoring %s, falling back to sklearn", ONNX_PATH, exc_info=True)
+        return None
+    # An export left over from a previous model.pkl would silently give wrong answers
+    if source != hashlib.sha256(MODEL_PATH.read_bytes()).hexdigest():
+        return None
+    return sess
+
+
+@lru_cache(maxsize=None)
+def get_predictor():
+    """Return a function mapping rows of (cat_tuple, num_tuple) to predictions.
+
+    Prefers the ONNX export of the estimator (a compiled tree walker, much
+    faster than sklearn for a few rows), then the sklearn estimator behind
+    the direct encoder, then the full pipeline.
+    """
+    model = get_model()
+    encode = _compile_encoder(model)
+    if encode is None:
+        return lambda rows: _pipeline_predict(model, rows)
+
+    sess = _onnx_session()
+    if sess is not None:
+        input_name = sess.get_inputs()[0].name
+        return lambda rows: sess.run(None, {input_name: encode(rows)})[0].ravel()
+
+    est = model.steps[-1][1]
+    return lambda rows: est.predict(encode(rows))
+
+
+# Set KAVACH_EAGER_LOAD=1 to load the model at import (CI, preloaded servers).
+# Only the pickle is loaded: ONNX Runtime sessions don't survive a fork, so
+# each worker opens its own on first use.
+if os.getenv("KAVACH_EAGER_LOAD"):
+    get_model()
+
+
+# Concurrent requests are coalesced into one model.predict call: the batch
+# worker takes the first queued row plus whatever else is already waiting
+# (at most BATCH_MAX rows) and predicts them together. It never sleeps to
+# gather more: a lone request goes straight through, and rows that arrive
+# during a predict call form the next batch.
+BATCH_MAX = 32
+
+_batch_queue = queue.Queue()
+_batch_lock = threading.Lock()
+_batch_worker = None
+
+
+def _batch_loop():
+    while True:
+        items = [_batch_queue.get()]
+        while len(items) < BATCH_MAX:
+            try:
+                items.append(_batch_queue.get_nowait())
+            except queue.Empty:
+                break
+
+        try:
+            preds = get_predictor()([row for row, _ in items])
+        except Exception as e:
+            for _, fut in items:
+                fut.set_exception(e)
+        else:
+            for (_, fut), p in zip(items, preds):
+                fut.set_result(float(p))
+
+
+def _predict_batched(cat_tuple, num_tuple):
+    """Queue one row for the batch worker and block until its prediction is ready."""
+    global _batch_worker
+    # Started on first use rather than at import, so that it runs in the
+    # serving process even when the app is imported before a fork
+    with _batch_lock:
+        if _batch_worker is None or not _batch_worker.is_alive():
+            _batch_worker = threading.Thread(target=_batch_loop, name="predict-batcher", daemon=True)
+            _batch_worker.start()
+    fut = Future()
+    _batch_queue.put(((cat_tuple, num_tuple), fut))
+    return fut.result()
+
+
+@lru_cache(maxsize=4096)
+def _predict_cached(cat_tuple, num_tuple):
+    """Predict CO₂ (g/km, 2 decimals) for one set of form inputs.
+
+    Only the float is cached so the cache stays small; the SVG costs ~10 µs
+    to render and is rebuilt per request.
+    """
+    return round(_predict_batched(cat_tuple, num_tuple), 2)
+
 # -----------------------
 # Flask app
 # -----------------------
 app = Flask(__name__)
+app.config["TEMPLATES_AUTO_RELOAD"] = False
+# Static assets (logo, images, CSS) rarely change; let browsers cache them for a
+# year. Their URLs carry a content hash (see STATIC_VERSIONS) so edits still show.
+app.config["SEND_FILE_MAX_AGE_DEFAULT"] = 31536000
+# gzip/brotli the HTML (mostly repetitive CSS and markup) and inline SVG
+app.config["COMPRESS_MIMETYPES"] = ["text/html", "image/svg+xml", "application/json"]
+app.config["COMPRESS_LEVEL"] = 6
+app.config["COMPRESS_MIN_SIZE"] = 512
+Compress(app)
 
 # -----------------------
 # HTML Template
@@ -67,124 +405,13 @@ HTML_FORM = """
 <head>
     <title>Tata Motors Kavach</title>
     <link href="https://fonts.googleapis.com/css2?family=Roboto:wght@400;700&display=swap" rel="stylesheet">
-    <style>
-        body {
-            font-family: 'Roboto', sans-serif;
-            background: linear-gradient(135deg, #d4fc79, #96e6a1, #00c9ff, #92fe9d);
-            background-size: 400% 400%;
-            animation: gradientShift 15s ease infinite;
-            margin: 0; padding: 0;
-            color: #222;
-        }
-        @keyframes gradientShift {
-            0% { background-position: 0% 50%; }
-            50% { background-position: 100% 50%; }
-            100% { background-position: 0% 50%; }
-        }
-        .container {
-            max-width: 1200px;
-            margin: 20px auto;
-            padding: 40px;
-            background: rgba(255, 255, 255, 0.9);
-            box-shadow: 0 8px 25px rgba(0,0,0,0.15);
-            border-radius: 16px;
-        }
-        .header {
-            text-align: center;
-            margin-bottom: 30px;
-        }
-        .logo {
-            width: 220px;
-            margin-bottom: 12px;
-        }
-        h1 {
-            font-size: 42px;
-            color: #14532d;
-        }
-        .content {
-            display: flex;
-            gap: 40px;
-            flex-wrap: wrap;
-        }
-        .form-section {
-            flex: 1.2;
-        }
-        .graph-section {
-            flex: 1;
-            text-align: center;
-        }
-        form {
-            display: grid;
-            grid-template-columns: 1fr 1fr;
-            gap: 25px;
-        }
-        label {
-            font-weight: 600;
-            margin-bottom: 8px;
-            display: block;
-            font-size: 16px;
-        }
-        input, select, textarea {
-            width: 100%;
-            padding: 16px;
-            border-radius: 10px;
-            border: 1px solid #aaa;
-            font-size: 17px;
-        }
-        button {
-            grid-column: span 2;
-            padding: 18px;
-            background: #14532d;
-            color: #fff;
-            font-size: 20px;
-            font-weight: bold;
-            border: none;
-            border-radius: 10px;
-            cursor: pointer;
-            margin-top: 10px;
-        }
-        button:hover { background: #1e7d4d; }
-        .result {
-            margin-top: 25px;
-            padding: 18px;
-            background: #f0fdf4;
-            border-left: 6px solid #16a34a;
-            border-radius: 8px;
-            font-size: 18px;
-        }
-        .suggestions {
-            margin-top: 25px;
-            padding: 20px;
-            background: #fff8e1;
-            border-left: 6px solid #f59e0b;
-            border-radius: 8px;
-        }
-        .suggestions h3 { margin: 0 0 10px; color: #92400e; }
-        .user-suggestions-box {
-            margin-top: 20px;
-            padding: 18px;
-            background: #e0f7fa;
-            border-left: 6px solid #0288d1;
-            border-radius: 10px;
-        }
-        .user-suggestions-box h3 { margin-top: 0; color: #0288d1; }
-        .extra-images {
-            margin-top: 40px;
-            text-align: center;
-        }
-        .extra-images img {
-            width: 400px;
-            margin: 15px;
-            border-radius: 12px;
-            box-shadow: 0 4px 12px rgba(0,0,0,0.2);
-        }
-    </style>
+    <link rel="stylesheet" href="{{ url_for('static', filename='style.css') }}">
 </head>
 <body>
     <div class="container">
         <div class="header">
             <!-- Tata Motors Logo -->
-            <img class="logo" src="data:image/jpeg;base64,/9j/4AAQSkZJRgABAQAAAQABAAD/2wCEAAkGBwgHBgkIBwgKCgkLDRYPDQwMDRsUFRAWIB0iIiAdHx8kKDQsJCYxJx8fLT0tMTU3Ojo6Iys/RD84QzQ5OjcBCgoKDQwNGg8PGjclHyU3Nzc3Nzc3Nzc3Nzc3Nzc3Nzc3Nzc3Nzc3Nzc3Nzc3Nzc3Nzc3Nzc3Nzc3Nzc3Nzc3N//AABEIAI4A4wMBIgACEQEDEQH/xAAcAAEAAgMBAQEAAAAAAAAAAAAABgcEBQgCAQP/xABIEAABAwMBBAYGBQcKBwAAAAABAAIDBAURBhIhMUEHE1FhkaEUIlJxgbEVMnLB0SMzQnSCorIXJCU0NlViY5KTJkNTZHPS8P/EABoBAQADAQEBAAAAAAAAAAAAAAACAwQFAQb/xAAwEQABAwIFAwEHBAMAAAAAAAAAAQIDBBESEyExMgVBUWEUIoGhweHwFUJxkSNS0f/aAAwDAQACEQMRAD8AvFERAEREAREQBERAEXl72xsc+RwaxoyXOOAAoheukazW8ujoy+4TD/onEeftn7sqyOJ8i2alyD5GRpdy2Jih3DJVM3PpGv1YS2ldDQx8hEzadjvc7PkAozW3Gurzmuramo35xLK5w8CcLazp0i8lsY39QYnFLl+VV8tFIdmqulFE72XztB8MrAl1ppuL613pz9jLvkFRAAHAAL6r06azu5Sheov7IheI13pknH0o34wyf+qyItYadl+reKQfbfs/NUMi9XpsfZVPE6hJ4Q6LpLlQVv8AU62mqP8AxStf8ispc0loPEBbOg1BeLcR6Hc6qMDg0yFzf9LsjyVTumr+1xY3qKfuadBoqmtXSfcoCGXOlhq2c3x/k3+/mD4BTmxayst7c2OnqepqHcIKgbDyewcnfAlY5aWWPVU0NcdTFJoi6kgREWc0BERAEREAREQBERAEREAREQBERAFG9V6woNOs6p384rnDLadh4d7j+iPPuWu19rMWVht9tc11xe3Ln8RADzPa48h8TyzUMsj5pHyzPdJI87TnvcSXHtJPFdClosz337GCprMHuM3Npf8AUl0v8hNfUHqc5bTx+rG34c/eclalF8JA4kBdhrUalmoclzlct3KfUXuGGWoOKeKSU9kbC75LMjsV4l/N2i4OHaKV+PHCK5E3UI1V2QwEW6j0jqKT6tnqv2gG/Mr867TN8t8Dp6y2VEcLRlzwA4NHacE4CjmxqtsSf2Syn2vhX+jUoi3UGkdRTxiSO0VOyeG3hh8HEFSc9reS2ItY53FLmlRbmTSeoYxl1nq/2WbXyWJJZbtF+dtVez7VK8fcvEkYuyoerG9N0UwV8IBGCMr1Kx0LtmZro3djxg+a8gg8DlTIks01ry6WYshqnOrqMburld67B/hd9x3e5W1ZLzQ3yiFVbpg9nBzTudGexw5Fc9LNs12rbLXMrLfKY5G7nNO9rx7LhzH/AMFhqKJkmrdFNlPWOj0dqh0Qi02ltQ0uo7cKmn9SVnqzwE5MbvvB5Hn78hblcVzVauF252GuRyXTYIiKJIIiIAiIgCIiAIiIAsa5Pq46GZ1vibLVbOImvdhu1yJPYOKyVEdT68o7DcH0Hok1TUMaHO2XNa0ZGQM8eGOXNWRRue6zUuQke1jbuWxGYujO71k8lRdLpTsllcXvcxrpS4niT9Vbik6LbVHg1VbWTkcQ0tY0+RPmtHV9KVzk/qdvpIB/mOdIfLZWmqtealqCf6R6lp/RhiYPMgnzXUy6x+6on56HMx0jdkVfz1LNpdC6apjltsZI7tme5/kThbantFqoxmmt1HB3sga37lQ898vFQSZ7rXPzyNQ/HhnCwZXOmdtTOdI7tecnzXi0Mruch6lbG3iw6NfWUkW59TAzHIyALHkvVpi/O3OiZ9qoYPvXO+y32R4L7gDgAvE6a3u75Beor/r8zpGnqIKmPrKaaOVntRuDh4hfalu1TytIBywjB4HcqF0fX1Ft1HQSUry3rJ2RSNB3PY5wBBHPju78K/JBmNw7isVTT5DkS9zZTz5zVW1jnnTY2r7aWkZzWQDB+21dELnrSwzqGzj/ALyA/vtXQcj+rjc/GdkE4WrqXNpn6dxcflVVtLRtDquphgaecsgaPNfhHeLXKMx3KjeO1s7T965+raye5VclbWSGSeZ205zt/HkOwDkF+GB2BTTpqW1dqQXqK30adHippZhstmhkB5B4KxamxWer31NropT7ToGk+OFzzst9keC/SGWSA5gkfEe2Nxb8k/TlTi/5fcfqCLyZ+f0XZVaB01UZP0f1Tjzhle3yzjyWlq+iu3vB9CuVVCf81rZAPDZ+ar2n1BeqYgw3eubjkahzh4E4W0pdf6lpz61cydvszQtPmAD5qXs9U3i8j7RTO5MJTZNF37TV4irrfV0tVB9WeIkxukZzGN4zzG/irGVU0nSpcGf1y2U03fFI6P57SnOlNTU2paWaWnhkhfC8NfHIQTvGQRjlx8Fkqo5+cifE1U0kHGNfgb1ERYjYEREAREQBERAEREAVDa6kMur7q53Hrg34BoA+SvlUh0k0jqXWFYSMNqGsmZ7i0A+bXLodOVM1f4MHUE/xp/JGURF2jkBERAEREBvdCUvpmrrZGRlrJetPdsAuHmAr3PAqpuiCk6291lWRugpwz4vd+DCraXE6g68tvCHZoG2iv5OfNJf2js/63D/EF0GufNJf2js/63F/EF0Gp9S5tK+ncFOdLrS+g3StpAMCCd8YHcHEDyWKpP0k0hpdX1ZxhtQ1kzfiMHzaVGF1InY2I7yhzZG4Xq0IiKwgEREAVh9DkhFfdI/0XRRuPvBd+JVeKzehykcIbnWkeq57IW+9oJP8TVlrVRIHfnc00aXnb+diyERF8+d0IiIAiIgCIiAIiIAoH0r2R1ZbIrrTszLR5EoHOI8/gd/uJU8Xl7GyMcyRocxww5rhkEdisikWJ6PQrljSRitU5sRSfXGlZdPVvWwNc62zO/Iv49WfYP3HmPiowvo2PbI1HN2Pn3scx2FwREUyIRF8JwMoC2+iKj6mw1NW4YNRUEA9rWgD57SnR4LT6Oovo/S9tpi3ZcIA947HO9Y+ZK3DtzT7l83O/HK5fU+hgbgiahz7pI/8R2f9bh/iC6DXPWlzjUNn/XYP42roVbOp82mPp3BxV/THR7NVba5rfrsfC53uILR5uVdK5ulOj9K0pJKBl1LMyUY7M7J8neSplbKF+KFE8GWtbhmVfIREWwyBEXxAemMfI9scbS973BrWtGS4ncAFfulLQLHYaWhODK1u1MRzed7vw9wChvRppJ0bo75c4y12M0kThwz+mR8vHsVkrjV9Qj1y27IdehgViY3bqERFzjeEREAREQBERAEREAREQH41lLT11LJS1cTZYJW7L2OGQQqi1foOrtDn1dsa+qoOJAGZIR3jmO8fHtVxor4Kh8K6bFE0DJk13OaRv4L6rq1HoO03lz54Wmiq3bzLCPVcf8TeB94we9VzetD321FzvRTVwD/m0uX7u9v1h4Y712YqyKTvZTky0kkfa6EbWXZqI3K7UVDgkTztY7Hsk+sfDKxDuJB3EHBB4hTHoqoPStT+kubllJC54PY53qjyLvBWzPwRq4qiZjkRpcgGBgcF4nIEEhPANPyXtfhXu2aGpd2ROPkV82m59Epz9pw4vlpPZWQfxtXRC50sZ2bvbSeVTCf3wui10up8mnN6dxcYt1o23G2VdE/cKiF0eezIxlc6FrmkteC17ThwPIrpVUPrmg+jtV3CINwySTrmd4f6x8yR8E6a/VzB1FmjXGiRe6eGapmENNDJNKeEcTC5x+A3qY2Po4u1cWyXFzaCDmHevIf2RuHxPwXTklZGl3LY50cT5Fs1LkNhiknlZFBG+SV5wxjGlznHsAHFWdozo+9HfHcL+1rpR60dJxaw9r+093D38pbYNM2qwR4oKf8ALEYfPJ60jvjy9wwFuFyqivV6YY9EOpT0SM95+qhERc43hERAEREAREQBERAEREAREQBERAEREBr7nZLXdR/SFBTzuxjbewbQ9zuIX42LTltsDqg2yJ0YqC3bDnl3DOMZ38ytsinmOw4b6EcDcWK2oWPcInz0FTDFjrJInNbtHAyQQFkIoItiRUNB0cX+nrKaV7qLZilY84mPAEH2e5W8iK+aofMqK7sUwwMhRUaFprtpe0Xi4R1txpeumZGIxl7g3AJIyAd/E8VuUVTXOat2rYsc1HJZUMeioKO3xdVQ0sNPH7MUYaPJZCIvFVV1UkiW2CIi8AREQBERAEREAREQBERAajVF8Zp61GvkgdOA9rNhrtk71EP5Vqf+6Jv94fgp7cKCkuVP6PX07J4SQ7YeMjI4Knuku3Uds1DFBb6aOniNIx5ZGMAuL3jPkPBbqNkMi4HJqYqt8saY2roSVnSpTue1v0RMMkD88PwUl1dqmn0zBTvlgdUSTvIbG1wacAbz5gfFR3o5sFouGm46mtt8E8/XPHWPbk7juUR6Q7qbtqecQkvipf5vEBzIPrY97sjvwFa2CKSbA1NEvcrWeVkONy6raxPNO9INLertDb3UUlM6YHYe6QOBcBnHDsBX76q1xFpy5toZKCSoLoWy7bZA3iSMcP8ACqsu9vrNMXtkLnAVFP1c0bwNxOAcjuDsj4K44aCyaoo6S7VNBBUOmhbh0jclo47PwJK8mhhiVr7Xap7DLNIjmXs5CLfyrU/90Tf7w/BbjSuuItR3N1DHQSQFsLpdt0gdwIGOHeqcqWhtVM1ow0SOAHdlXjV0Vl0rQVd3pbfTwSQwu3sbguzjDfidkKVTBDGiI1uq7EaeaaRVVztE3NTfukWltF2qLe2hkqDAQ10jZABtYyRw5ZwtzpLU1PqakmmhhdBJDJsPic4OIBGQfcd/gVTdltlZqO6Swxu26h8ctRI883AZ3+9xA+K2nRvd/ozUsMcjsQVo6h+eTj9Q+O79oqUtHGkao3kiEYquRZEV3FS7VDtQdIFHY7vPbpqKoldDs7T2Obje0O59xUxVP6go/pXWOqGAFz4qMyswN+YxF+GPisdJGx7lx7IhrqpHsamDe5Z17vFPZ7NLc5QZImNaWhh3v2iAMeK1+ktWU+pnVYgpZYDTBhPWOB2tra4Y+yoNLXv1DYNJ2JpJdNMWz7J3hkR2R+6SfgsvQkzqO6at6hoDomvdG0Dm10mArVpmtidfl97f9KkqHOlbbj9rkjvuvKG3XB1uoqWe41rXFro4OAcOLc7ySOeAcJYNeUN0rxb6ummt9Y47LY5uDnezndg+8BaPocp4nw3Ktfh9SXtj2jvIbjJ8Tx9y/DpihjgqrXWw/k6lzZAXt3OIaWlpz3EnxUsmLNyLa+fX+DzOlys6+nj0NxcekemoK6qpZLVWO9HmfEZAQGu2XEZHvwvVq6RKe5XCmpI7XVs9IkDBISC0ZOMrK6RHufoSqe8Yc4QFw7+sYvWgnui0FSSMGXMjmcB2kPeoYYsnHh1vbf0J4pc7Bi0tfb1PN/11Q2quNvpKae4VoOy6KDg0+znme4ArxY9fUNxuDbdXUk9urHu2Wsm+qXHg3O4gnlkLQ9DsMc8t0rpj1lX6jdp29wDskn4keS+9MlPCwW2sZhtSS+MuG4lowR4H5qeTFm5FtfPrbwQzpcrOvp49CT6r1fDpuopoJKOapkqGlzRGQOBxjzWupukWjFZHTXa21ttMnB87fVHec4OO/Cj/AEi1EpuOm6l8bnzdQ2QsA3udtNOPFY+obnUayvdttNbSfQ2y8jNVtbZ2sci0YzjcOBPNSjpmKxqqnm632+BGSoej3Ii+LJb6k+1Tq2g031cc7JJ6qUZZBFjOOGSTwGdyw9P6zku11jt9RZKyjkkY57XycMAcTkDuG7PELW660zc5rnRXuxASzUrGN6k42gWElrhnceO8fNZGl9dPuFybab1Qmir3eq0gEBzsZwWne044cVSkTFhxNS699dvgWrK9JsLlsnbTf4k2REWI2BERAEREAVa9I+mbzeL/ABVNtoTPC2lZGXCVjcODnkjDnA8wrKRWwzOhdiaVSxJK3CpDtMUF4smh56dtEfpMGQww9Yw+s4+qc5xjnx5KKaT0PeY9QUc93oTFSwP617nSsdtObvaNzifrY81biK1Kt7cVkT3itaVi4brxIL0l6YrLyaOstVP11THmKRoc1pLDvBy4jgc/6lldG9DebVbqi33ijdBGyTbp3GRjtzvrN9UnG/f+0VMEUFqHLFlKmhJIGpLmJuUhUaH1M6ple21OLXSOIPXxbxn7SnvSTQXm7UNNQWijdPEX9ZO4SMbw+q31iM7yT8ApkisdWPc5rlRNCDaRjWuairqQjo001WWSKtqbpT9TVTODGMLmuwwb85aTxJ/dUX1Noa9G/wBZNaKF0tLJJ1sT2zMbsk7yMFwIw7PkrfReNrJGyLJ5PXUkaxozwYlqkq5bbTPuEPU1ZjHXR5Bw/nwJGFFNPWG5U+u7xdK6l2KOoZIyJ5ex22C9mNwORubzCmyKlsqtxWTctdGjsN+xX2itFVdl1HUVlY1no0LXspCH7ROTgO7vVz4rJ0jYbnbtW3qrrKTYoqp0pif1jHbWZMjcDneDzCnCKx1U91799CttMxtrdtStm6b1HpK7T1Ol44qyin3GCRwyByBBIzjJwQfevUOmL/qe9w3DVbIaalgxs0zCDtAHOyACcA8yTnl7rHRS9rfvZL+e557Kza628djQa6t1XddMVdHQRdbUSOjLWbQbnD2k7yQOAK96JoKq2aYoqOvi6qoj29tm0HYy9xG8EjgQt4ipzVy8vte5blpmZne1it5NM6g0tepq7SkcVVST5BpnuA2Rx2SCRkDkQc+eQ01qHVd3grNVRxUlHBuFPG4EuHEgAE4zjeSc9yshFd7W/eyX89yr2Vm11t47EG11YLndL7Z6m30vWwUxHWu6xrdn1weBI5DkvvSRpy43eS31lmh6yqpy5rsPa0gbi05cRwIPipwii2pe3Db9v1JOp2uxX7/QiV/rNYwVcE1lt1PNTOp29ZDKWksk37X6Q7QNxI3LU2jTl/u2qYb9qSKClEGC2GMjLi36oABOBk5yTnl7rDRG1CtbZqInr3DoEc67lVfQIiLOXhERAf/Z" alt="Tata Motors Logo">
+            <img class="logo" src="{{ url_for('static', filename='logo.jpg') }}" alt="Tata Motors Logo">
             <h1>KAVACH</h1>
         </div>
         <div class="content">
@@ -194,9 +421,7 @@ HTML_FORM = """
                         <div>
                             <label>{{c}}:</label>
                             <select name="{{c}}" required>
-                                {% for val in dropdown_values[c] %}
-                                    <option value="{{val}}">{{val}}</option>
-                                {% endfor %}
+                                {{ select_html[c]|safe }}
                             </select>
                         </div>
                     {% endfor %}
@@ -213,6 +438,12 @@ HTML_FORM = """
                     <button type="submit">Predict CO₂</button>
                 </form>
 
+                {% if error %}
+                <div class="form-error">
+                    <p><strong>Error:</strong> {{error}}</p>
+                </div>
+                {% endif %}
+
                 {% if prediction %}
                 <div class="result">
                     <p><strong>Predicted CO₂:</strong> {{prediction}} g/km</p>
@@ -242,7 +473,7 @@ HTML_FORM = """
             {% if graph %}
             <div class="graph-section">
                 <h3>Graphical Analysis</h3>
-                <img src="data:image/png;base64,{{graph}}" alt="Graph">
+                {{graph|safe}}
             </div>
             {% endif %}
         </div>
@@ -258,69 +489,140 @@ HTML_FORM = """
 </html>
 """
 
+# Compiled once; render_template_string would hash and look up the source on every call
+PAGE_TEMPLATE = app.jinja_env.from_string(HTML_FORM)
+
+# Static files are cached for a year, so every static URL carries a content hash
+STATIC_DIR = BASE_DIR / "static"
+STATIC_VERSIONS = {
+    p.relative_to(STATIC_DIR).as_posix(): hashlib.blake2b(p.read_bytes(), digest_size=4).hexdigest()
+    for p in STATIC_DIR.rglob("*") if p.is_file()
+}
+
+
+@app.url_defaults
+def _static_version(endpoint, values):
+    """Add ?v=<hash> to every url_for('static', ...) so a changed file gets a new URL."""
+    if endpoint == "static" and "v" not in values:
+        values["v"] = STATIC_VERSIONS.get(values.get("filename"))
+
+# Mixed into result ETags so a retrained model invalidates what browsers hold
+_ETAG_SALT = str(MODEL_PATH.stat().st_mtime_ns)
+
+
+def _result_etag(payload):
+    """Stable ETag for the result page of one form submission."""
+    blob = orjson.dumps([_ETAG_SALT, payload], option=orjson.OPT_SORT_KEYS)
+    return hashlib.blake2b(blob, digest_size=16).hexdigest()
+
+# -----------------------
+# Suggestions
+# -----------------------
+SUGGESTIONS_HIGH = (
+    "Consider regular maintenance to improve fuel efficiency.",
+    "Carpool whenever possible to reduce per-person emissions.",
+    "Adopt smooth driving habits to reduce fuel use.",
+    "Explore hybrid or electric vehicles for the future.",
+)
+SUGGESTIONS_LOW = (
+    "Great job! Your car is performing better than the fleet average.",
+    "Keep maintaining your vehicle regularly.",
+    "Try using biofuels or renewable energy options when possible.",
+    "Also use safety measures to increase rider safety",
+)
+
 # -----------------------
 # Routes
 # -----------------------
+def _parse_numeric(payload):
+    """Parse the numeric form fields; returns (values, None) or (None, error message)."""
+    values = []
+    for n in NUMERIC:
+        try:
+            v = float(payload[n])
+        except (TypeError, ValueError):
+            return None, f"{n} must be a number"
+        if not math.isfinite(v):
+            return None, f"{n} must be a finite number"
+        values.append(v)
+    return tuple(values), None
+
+
+def _render_page(status=200, etag=None, **ctx):
+    """Render the page; ctx overrides the empty (GET) prediction context."""
+    context = dict(prediction=None, error=None, graph=None, suggestions=(), user_suggestion=None) | ctx
+    response = make_response(PAGE_TEMPLATE.render(
+        categorical=CATEGORICAL,
+        numeric=NUMERIC,
+        fleet_avg=fleet_avg,
+        select_html=SELECT_HTML,
+        **context,
+    ), status)
+    if etag:
+        response.set_etag(etag)
+    return response
+
+
+@lru_cache(maxsize=None)
+def _form_page():
+    """The GET page is the same for everyone: render it once, tag it by content."""
+    body = _render_page().get_data()
+    return body, hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def _not_modified(etag):
+    # Flask-Compress sends the tag as "<etag>:<encoding>", so compare the prefix
+    return any(tag.partition(":")[0] == etag for tag in request.if_none_match)
+
+
 @app.route("/", methods=["GET", "POST"])
 def home():
-    prediction, graph, suggestions, user_suggestion = None, None, [], None
-    if request.method == "POST":
-        payload = {c: request.form.get(c) for c in CATEGORICAL + NUMERIC}
-        user_suggestion = request.form.get("user_suggestion", "").strip()
+    if request.method != "POST":
+        body, etag = _form_page()
+        response = make_response(("", 304) if _not_modified(etag) else body)
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "public, max-age=3600"
+        return response
 
-        row = {c: float(payload[c]) if c in NUMERIC else payload[c] for c in CATEGORICAL + NUMERIC}
-        X = pd.DataFrame([row], columns=CATEGORICAL + NUMERIC)
+    payload = {c: request.form.get(c) for c in FIELDS}
+    user_suggestion = request.form.get("user_suggestion", "").strip()
 
-        try:
-            pred = model.predict(X)
-            prediction = round(float(pred[0]), 2)
-
-            # Graph
-            plt.figure(figsize=(5,4))
-            plt.bar(["Your Car", "Fleet Avg"], [prediction, fleet_avg], color=["#0d3b66", "#66bb6a"])
-            plt.ylabel("CO₂ g/km")
-            plt.title("CO₂ Emission Comparison")
-            buf = io.BytesIO()
-            plt.savefig(buf, format="png")
-            buf.seek(0)
-            graph = base64.b64encode(buf.read()).decode("utf-8")
-            buf.close()
-            plt.close()
-
-            # Suggestions
-            if prediction > fleet_avg:
-                suggestions = [
-                    "Consider regular maintenance to improve fuel efficiency.",
-                    "Carpool whenever possible to reduce per-person emissions.",
-                    "Adopt smooth driving habits to reduce fuel use.",
-                    "Explore hybrid or electric vehicles for the future."
-                ]
-            else:
-                suggestions = [
-                    "Great job! Your car is performing better than the fleet average.",
-                    "Keep maintaining your vehicle regularly.",
-                    "Try using biofuels or renewable energy options when possible.",
-                    "Also use safety measures to increase rider safety"
-                ]
-        except Exception as e:
-            prediction = f"Error: {str(e)}"
+    # Reject bad numbers before any hashing, caching or model work
+    num_tuple, error = _parse_numeric(payload)
+    if error:
+        return _render_page(400, error=error, user_suggestion=user_suggestion)
 
-    tata_logo = ""  # You already had this embedded in base64 earlier
-    return render_template_string(
-        HTML_FORM,
-        categorical=CATEGORICAL,
-        numeric=NUMERIC,
+    etag = _result_etag(payload | {"user_suggestion": user_suggestion})
+    # Browsers never send If-None-Match when re-submitting a form, so only
+    # scripted clients get here. For a POST a matching tag means the
+    # precondition failed (RFC 7232 section 3.2): 412, not 304.
+    if _not_modified(etag):
+        response = make_response("", 412)
+        response.set_etag(etag)
+        return response
+
+    graph, suggestions = None, ()
+    try:
+        cat_tuple = tuple(payload[c] for c in CATEGORICAL)
+        prediction = _predict_cached(cat_tuple, num_tuple)
+        graph = _render_graph(prediction)
+
+        suggestions = SUGGESTIONS_HIGH if _IS_HIGH(prediction) else SUGGESTIONS_LOW
+    except Exception as e:
+        prediction = f"Error: {str(e)}"
+
+    return _render_page(
+        etag=etag,
         prediction=prediction,
-        fleet_avg=fleet_avg,
-        dropdown_values=dropdown_values,
         graph=graph,
         suggestions=suggestions,
         user_suggestion=user_suggestion,
-        tata_logo=tata_logo
     )
 
 # -----------------------
 # Run Flask
 # -----------------------
+# Development server only; production goes through gunicorn and wsgi.py (see Procfile).
+# Set FLASK_DEV=1 for the debugger and reloader.
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    app.run(host="0.0.0.0", port=5000, debug=os.getenv("FLASK_DEV", "").lower() in ("1", "true", "yes", "on"))
@@ -0,0 +1,43 @@
+from __future__ import annotations
+import hashlib
+import joblib
+import onnx
+from skl2onnx import convert_sklearn
+from skl2onnx.common.data_types import FloatTensorType
+
+# Offline step, run from the repo root after train_model.py (which runs it
+# itself when skl2onnx is installed). Needs skl2onnx; the app itself does not.
+
+# --------------------
+# Paths
+# --------------------
+MODEL_PATH = "ml/model.pkl"
+ONNX_PATH = "ml/model.onnx"
+
+# --------------------
+# Convert
+# --------------------
+# Only the final estimator is exported: the app encodes rows into the
+# preprocessor's output layout itself, and skl2onnx can't convert the
+# string SimpleImputer anyway.
+print(f"Loading model from {MODEL_PATH}")
+with open(MODEL_PATH, "rb") as f:
+    source_sha256 = hashlib.sha256(f.read()).hexdigest()
+pipe = joblib.load(MODEL_PATH)
+est = pipe.steps[-1][1]
+
+onx = convert_sklearn(
+    est,
+    initial_types=[("X", FloatTensorType([None, est.n_features_in_]))],
+    # Keep to opsets the pinned onnxruntime understands
+    target_opset={"": 17, "ai.onnx.ml": 3},
+)
+
+# Lets the app check the ONNX file was exported from the model.pkl it loads
+onnx.helper.set_model_props(onx, {"source_sha256": source_sha256})
+
+# --------------------
+# Save artifact
+# --------------------
+onnx.save(onx, ONNX_PATH)
+print(f"✅ ONNX model saved to {ONNX_PATH}")
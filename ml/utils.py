@@ -4,16 +4,17 @@ from typing import Dict, Any
 
 
 import numpy as np
+import orjson
 import pandas as pd
 
 
 CATEGORICAL_COLS = [
-"make", "model", "vehicle_class", "transmission", "fuel_type"
+    "make", "model", "vehicle_class", "transmission", "fuel_type"
 ]
 NUMERIC_COLS = [
-"year", "engine_displ_l", "cylinders",
-"fuel_cons_l_per_100km_city", "fuel_cons_l_per_100km_hwy",
-"curb_weight_kg", "power_kw", "stop_start"
+    "year", "engine_displ_l", "cylinders",
+    "fuel_cons_l_per_100km_city", "fuel_cons_l_per_100km_hwy",
+    "curb_weight_kg", "power_kw", "stop_start"
 ]
 TARGET = "co2_g_km"
 
@@ -23,41 +24,55 @@ REQUIRED_COLUMNS = CATEGORICAL_COLS + NUMERIC_COLS + [TARGET]
 
 
 
+def _clean_text(col: pd.Series) -> pd.Series:
+    # Few distinct makes/models/classes: clean each distinct value once and
+    # map back by code. split/join trims and collapses runs of whitespace
+    # without a regex pass. Missing values get code -1, which picks the
+    # trailing NaN, so they stay missing for the Pipeline's imputer.
+    codes, uniques = pd.factorize(col)
+    cleaned = np.array([" ".join(str(v).split()).title() for v in uniques] + [np.nan], dtype=object)
+    return pd.Series(cleaned[codes], index=col.index, name=col.name)
+
+
+
+
 def clean_df(df: pd.DataFrame) -> pd.DataFrame:
-df = df.copy()
-# Standardize text
-for c in ["make", "model", "vehicle_class", "transmission", "fuel_type"]:
-if c in df:
-df[c] = (
-df[c]
-.astype(str)
-.str.strip()
-.str.replace("\\s+", " ", regex=True)
-.str.title()
-)
-# Ensure numeric types
-numeric_types = {
-"year": int,
-"engine_displ_l": float,
-"cylinders": int,
-"fuel_cons_l_per_100km_city": float,
-"fuel_cons_l_per_100km_hwy": float,
-"curb_weight_kg": float,
-"power_kw": float,
-"stop_start": int,
-TARGET: float,
-}
-for col, typ in numeric_types.items():
-if col in df:
-df[col] = pd.to_numeric(df[col], errors="coerce").astype(typ, errors="ignore")
-# Drop impossible rows
-df = df.dropna(subset=[TARGET])
-df = df[(df["engine_displ_l"] > 0) & (df["curb_weight_kg"] > 0)]
-# Replace missing with medians/modes later in Pipeline
-return df
+    # Cleaned columns are collected here and the frame assembled once at the
+    # end: no up-front df.copy() of columns that get replaced anyway, and the
+    # caller's frame is never written to.
+    cleaned: Dict[str, pd.Series] = {}
+    # Standardize text
+    for c in CATEGORICAL_COLS:
+        if c in df:
+            cleaned[c] = _clean_text(df[c])
+    # Ensure numeric types, as small as the values allow
+    numeric_types = {
+        "year": "int16",
+        "engine_displ_l": "float32",
+        "cylinders": "int8",
+        "fuel_cons_l_per_100km_city": "float32",
+        "fuel_cons_l_per_100km_hwy": "float32",
+        "curb_weight_kg": "float32",
+        "power_kw": "float32",
+        "stop_start": "int8",
+        TARGET: "float32",
+    }
+    num_cols = [c for c in numeric_types if c in df]
+    numeric = df[num_cols].apply(pd.to_numeric, errors="coerce")
+    # An integer column with gaps stays float so the NaNs survive for imputation
+    numeric = numeric.astype({
+        c: numeric_types[c] if numeric_types[c].startswith("float") or numeric[c].notna().all() else "float32"
+        for c in num_cols
+    })
+    cleaned.update(numeric.items())
+    df = pd.DataFrame({c: cleaned.get(c, df[c]) for c in df.columns}, copy=False)
+    # Drop impossible rows (NaN fails the comparisons too) in a single selection
+    df = df[df[TARGET].notna() & (df["engine_displ_l"] > 0) & (df["curb_weight_kg"] > 0)]
+    # Replace missing with medians/modes later in Pipeline
+    return df
 
 
 
 
 def save_metadata(path: Path, meta: Dict[str, Any]):
-path.write_text(json.dumps(meta, indent=2))
\ No newline at end of file
+    path.write_bytes(orjson.dumps(meta, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
\ No newline at end of file
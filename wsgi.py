@@ -0,0 +1,6 @@
+import os
+
+# Load the model in the gunicorn master so --preload workers share it copy-on-write
+os.environ.setdefault("KAVACH_EAGER_LOAD", "1")
+
+from app import app  # noqa: E402,F401